@@ -21,7 +21,7 @@ from mozaik.analysis.data_structures import PerNeuronValue
 from mozaik.analysis.data_structures import PerNeuronPairValue
 from mozaik.analysis.data_structures import PerNeuronPairAnalogSignalList
                                         
-from mozaik.analysis.helper_functions import psth
+from mozaik.analysis.helper_functions import psth, mean_rates_matrix
 from mozaik.core import ParametrizedObject
 from parameters import ParameterSet
 from mozaik.storage import queries
@@ -30,6 +30,11 @@ from mozaik.tools.circ_stat import circ_mean, circular_dist
 from mozaik.tools.neo_object_operations import neo_mean, neo_sum, down_sample_analog_signal_average_method
 import mozaik
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 logger = mozaik.getMozaikLogger()
 
 class Analysis(ParametrizedObject):
@@ -99,7 +104,7 @@ class TrialAveragedFiringRate(Analysis):
             segs = dsv1.get_segments()
             st = [MozaikParametrized.idd(s) for s in dsv1.get_stimuli()]
             # transform spike trains due to stimuly to mean_rates
-            mean_rates = [numpy.array(s.mean_rates()) for s in segs]
+            mean_rates = list(mean_rates_matrix(segs))
             # collapse against all parameters other then trial
             #for s in st:
             #    print st
@@ -111,8 +116,9 @@ class TrialAveragedFiringRate(Analysis):
             #JAHACK make sure that mean_rates() return spikes per second
             units = munits.spike / qt.s
             logger.debug('Adding PerNeuronValue containing trial averaged firing rates to datastore')
+            results = []
             for mr, vr, st in zip(_mean_rates,_var_rates, s):
-                self.datastore.full_datastore.add_analysis_result(
+                results.append(
                     PerNeuronValue(mr,segs[0].get_stored_spike_train_ids(),units,
                                    stimulus_id=str(st),
                                    value_name='Firing rate',
@@ -120,7 +126,7 @@ class TrialAveragedFiringRate(Analysis):
                                    tags=self.tags,
                                    analysis_algorithm=self.__class__.__name__,
                                    period=None))
-                self.datastore.full_datastore.add_analysis_result(
+                results.append(
                     PerNeuronValue(vr,segs[0].get_stored_spike_train_ids(),units,
                                    stimulus_id=str(st),
                                    value_name='Tria-to-trial Var of Firing rate',
@@ -128,11 +134,59 @@ class TrialAveragedFiringRate(Analysis):
                                    tags=self.tags,
                                    analysis_algorithm=self.__class__.__name__,
                                    period=None))
+            self.datastore.full_datastore.add_analysis_results(results)
 
 
 
 
 
+def _vector_average_numpy(V, P):
+    """
+    Computes the vector average of the responses `V` (parameter values x neurons) to the angles `P` (in radians).
+    Returns the angle of the average vector in (0, 2*pi) and its length for each neuron. The responses are
+    normalized as in `circ_mean` with normalize=True, neurons with all-zero responses get zero length.
+    """
+    C = numpy.cos(P)[:, numpy.newaxis] * V
+    S = numpy.sin(P)[:, numpy.newaxis] * V
+    n = numpy.abs(V).sum(axis=0)
+    # neurons with all-zero responses are kept at zero (as circ_mean with normalize=True does)
+    n[n == 0] = 1.0
+    # the weights are normalized and then averaged over the parameter values, as in circ_mean
+    x = C.sum(axis=0) / n / len(P)
+    y = S.sum(axis=0) / n / len(P)
+    return (numpy.arctan2(y, x) + 4*numpy.pi) % (2*numpy.pi), numpy.hypot(x, y)
+
+
+if numba is not None:
+    @numba.njit(cache=True, parallel=True, fastmath=True)
+    def _vector_average(V, P):
+        """
+        Numba version of `_vector_average_numpy`.
+        """
+        t, n = V.shape
+        c = numpy.cos(P)
+        s = numpy.sin(P)
+        angle = numpy.empty(n)
+        length = numpy.empty(n)
+        for j in numba.prange(n):
+            x = 0.0
+            y = 0.0
+            w = 0.0
+            for i in range(t):
+                x += c[i]*V[i, j]
+                y += s[i]*V[i, j]
+                w += abs(V[i, j])
+            if w == 0.0:
+                w = 1.0
+            x = x / w / t
+            y = y / w / t
+            angle[j] = (numpy.arctan2(y, x) + 4*numpy.pi) % (2*numpy.pi)
+            length[j] = numpy.hypot(x, y)
+        return angle, length
+else:
+    _vector_average = _vector_average_numpy
+
+
 class PeriodicTuningCurvePreferenceAndSelectivity_VectorAverage(Analysis):
     """
     Calculates a preference and selectvitiy tuning of a periodic variable via vector average method.
@@ -175,45 +229,82 @@ class PeriodicTuningCurvePreferenceAndSelectivity_VectorAverage(Analysis):
             d = colapse_to_dictionary([z.get_value_by_id(self.pnvs[0].ids) for z in self.pnvs],
                                       st,
                                       self.parameters.parameter_name)
+            # look up the parameter description and the derived labels once for all stimuli
+            param = st[0].getParams()[self.parameters.parameter_name]
+            period = param.period
+            k_factor = 2*numpy.pi / period
+            pref_name = self.parameters.parameter_name + ' preference'
+            sel_name = self.parameters.parameter_name + ' selectivity'
+            results = []
             for k in d.keys():
                 keys, values = d[k]
-                y = []
-                x = []
-                for v, p in zip(values, keys):
-                    y.append(v)
-                    x.append(numpy.zeros(numpy.shape(v)) + p)
-                pref, sel = circ_mean(numpy.array(x),
-                                      weights=numpy.array(y),
-                                      axis=0,
-                                      low=0,
-                                      high=st[0].getParams()[self.parameters.parameter_name].period,
-                                      normalize=True)
-
-                logger.debug('PeriodicTuningCurvePreferenceAndSelectivity_VectorAverage: Adding PerNeuronValue to datastore')
-                self.datastore.full_datastore.add_analysis_result(
+                # stack the responses into a (parameter values, neurons) matrix and
+                # compute the vector average for all neurons at once
+                V = numpy.stack([numpy.asarray(v, dtype=numpy.float64) for v in values])
+                P = numpy.asarray(keys, dtype=numpy.float64) * k_factor
+                pref, sel = _vector_average(V, P)
+                pref = pref / k_factor
+
+                results.append(
                     PerNeuronValue(pref,
                                    self.pnvs[0].ids, 
-                                   st[0].getParams()[self.parameters.parameter_name].units,
-                                   value_name=self.parameters.parameter_name + ' preference',
+                                   param.units,
+                                   value_name=pref_name,
                                    sheet_name=sheet,
                                    tags=self.tags,
-                                   period=st[0].getParams()[self.parameters.parameter_name].period,
+                                   period=period,
                                    analysis_algorithm=self.__class__.__name__,
                                    stimulus_id=str(k)))
-                self.datastore.full_datastore.add_analysis_result(
+                results.append(
                     PerNeuronValue(sel,
                                    self.pnvs[0].ids,
-                                   st[0].getParams()[self.parameters.parameter_name].units,
-                                   value_name=self.parameters.parameter_name + ' selectivity',
+                                   param.units,
+                                   value_name=sel_name,
                                    sheet_name=sheet,
                                    tags=self.tags,
                                    period=1.0,
                                    analysis_algorithm=self.__class__.__name__,
                                    stimulus_id=str(k)))
 
+            logger.debug('PeriodicTuningCurvePreferenceAndSelectivity_VectorAverage: Adding PerNeuronValues to datastore')
+            self.datastore.full_datastore.add_analysis_results(results)
+
+
 
 
 
+def _gsta_window_sum_numpy(raw, idx, gstal):
+    """
+    Sums the windows of `raw` of length 2*`gstal`+1 centered on each index in `idx`.
+    The indexes are assumed to be already checked to have their whole window within `raw`.
+    """
+    return raw[idx[:, numpy.newaxis] + numpy.arange(-gstal, gstal + 1)].sum(axis=0)
+
+
+if numba is not None:
+    @numba.njit(cache=True, parallel=True, fastmath=True)
+    def _gsta_window_sum(raw, idx, gstal):
+        """
+        Numba version of `_gsta_window_sum_numpy`.
+        """
+        w = 2*gstal + 1
+        nchunks = max(1, min(numba.get_num_threads(), len(idx)))
+        # each thread sums the windows of one contiguous block of spikes into its own accumulator,
+        # so that every window is read contiguously, the accumulators are reduced at the end
+        acc = numpy.zeros((nchunks, w))
+        for c in numba.prange(nchunks):
+            for k in range(c*len(idx)//nchunks, (c+1)*len(idx)//nchunks):
+                start = idx[k] - gstal
+                for j in range(w):
+                    acc[c, j] += raw[start + j]
+        out = numpy.zeros(w)
+        for c in range(nchunks):
+            for j in range(w):
+                out[j] += acc[c, j]
+        return out
+else:
+    _gsta_window_sum = _gsta_window_sum_numpy
+
 
 class GSTA(Analysis):
     """
@@ -257,14 +348,11 @@ class GSTA(Analysis):
                 st = MozaikParametrized.idd(st)
                 st.trial=None
                 segs = dsv2.get_segments()
-                asl_e = []
-                asl_i = []
-                for n in self.parameters.neurons:
-                    sp = [s.get_spiketrain(n) for s in segs]
-                    g_e = [s.get_esyn(n) for s in segs]
-                    g_i = [s.get_isyn(n) for s in segs]
-                    asl_e.append(self._do_gsta(g_e, sp))
-                    asl_i.append(self._do_gsta(g_i, sp))
+                # retrieve the data of all the requested neurons in a single pass over the segments
+                sp = [s.get_spiketrain(self.parameters.neurons) for s in segs]
+                g_e = [s.get_esyn(self.parameters.neurons) for s in segs]
+                g_i = [s.get_isyn(self.parameters.neurons) for s in segs]
+                asl_e, asl_i = self._do_gsta(g_e, g_i, sp)
                 self.datastore.full_datastore.add_analysis_result(
                     ConductanceSignalList(asl_e,
                                           asl_i,
@@ -274,27 +362,77 @@ class GSTA(Analysis):
                                           analysis_algorithm=self.__class__.__name__,
                                           stimulus_id=str(st)))
 
-    def _do_gsta(self, analog_signal, sp):
-        dt = analog_signal[0].sampling_period
+    def _do_gsta(self, g_e, g_i, sp):
+        """
+        Computes the excitatory and inhibitory GSTA of all neurons in `self.parameters.neurons` in one pass over the trials.
+
+        Parameters
+        ----------
+        g_e, g_i : list(list(AnalogSignal))
+                 The excitatory and inhibitory conductances, first index corresponds to trials, second to neurons.
+                 Both are assumed to be sampled identically.
+
+        sp : list(list(SpikeTrain))
+           The spike trains, first index corresponds to trials, second to neurons.
+           They do not have to be sorted, the spike times are sorted before selecting the spikes.
+
+        Returns
+        -------
+        (gsta_e, gsta_i) : list(AnalogSignal), list(AnalogSignal)
+                         The excitatory and inhibitory GSTA of each neuron.
+        """
+        dt = g_e[0][0].sampling_period
         gstal = int(self.parameters.length/dt)
-        gsta = numpy.zeros(2*gstal + 1,)
-        count = 0
-        for (ans, spike) in zip(analog_signal, sp):
-            for time in spike:
-                if time > ans.t_start  and time < ans.t_stop:
-                    idx = int((time - ans.t_start)/dt)
-                    if idx - gstal > 0 and (idx + gstal + 1) <= len(ans):
-                        gsta = gsta + ans[idx-gstal:idx+gstal+1].flatten().magnitude
-                        count +=1
-        if count == 0:
-            count = 1
-        gsta = gsta / count
-        gsta = gsta * analog_signal[0].units
-
-        return NeoAnalogSignal(gsta,
-                            t_start=-gstal*dt,
-                            sampling_period=dt,
-                            units=analog_signal[0].units)
+        n = len(self.parameters.neurons)
+
+        # Pack the conductances of all trials into one flat buffer, trial after trial, each trial
+        # stored as a contiguous (neurons, time) block. Trials do not need to have the same length.
+        # The buffers are allocated once and each signal is copied directly into its place.
+        size = sum(len(e_trial[0]) for e_trial in g_e) * n
+        data_e = numpy.empty(size)
+        data_i = numpy.empty(size)
+        # for each neuron the positions in the buffers of the centers of its STA windows,
+        # these are the same for the excitatory and inhibitory conductances
+        centers = [[] for i in xrange(n)]
+        offset = 0
+        for (e_trial, i_trial, spike_trial) in zip(g_e, g_i, sp):
+            l = len(e_trial[0])
+            assert len(i_trial[0]) == l, "GSTA: excitatory and inhibitory conductances have to be sampled identically"
+            block_e = data_e[offset:offset + n*l].reshape(n, l)
+            block_i = data_i[offset:offset + n*l].reshape(n, l)
+            for j in xrange(n):
+                block_e[j] = numpy.ravel(e_trial[j].magnitude)
+                block_i[j] = numpy.ravel(i_trial[j].magnitude)
+            # all signals in a segment share the same time axis
+            t_start = e_trial[0].t_start.rescale(dt.units).magnitude
+            for i, spike in enumerate(spike_trial):
+                times = numpy.asarray(spike.rescale(dt.units).magnitude)
+                # neo does not guarantee that spike trains are sorted, once sorted the spikes whose whole
+                # window falls within the recording (gstal <= idx < l - gstal) form a contiguous block of idx
+                idx = numpy.sort(numpy.floor((times - t_start)/dt.magnitude).astype(numpy.int64))
+                idx = idx[numpy.searchsorted(idx, gstal):numpy.searchsorted(idx, l - gstal)]
+                centers[i].append(offset + i*l + idx)
+            offset += n*l
+
+        # one gather over the whole experiment per neuron and conductance
+        gsta_e = numpy.zeros((n, 2*gstal + 1))
+        gsta_i = numpy.zeros((n, 2*gstal + 1))
+        for i in xrange(n):
+            idx = numpy.concatenate(centers[i])
+            if len(idx) != 0:
+                gsta_e[i] = _gsta_window_sum(data_e, idx, gstal) / len(idx)
+                gsta_i[i] = _gsta_window_sum(data_i, idx, gstal) / len(idx)
+
+        units_e = g_e[0][0].units
+        units_i = g_i[0][0].units
+        return ([NeoAnalogSignal(g * units_e,
+                                 t_start=-gstal*dt,
+                                 sampling_period=dt,
+                                 units=units_e) for g in gsta_e],
+                [NeoAnalogSignal(g * units_i,
+                                 t_start=-gstal*dt,
+                                 sampling_period=dt,
+                                 units=units_i) for g in gsta_i])
 
 
 
@@ -356,23 +494,30 @@ class TrialToTrialCrossCorrelationOfAnalogSignalList(Analysis):
                                          stimulus_id=str(st)))           
                 
     def cross_correlation(self,ass):
-	logger.info("TTC: " + str(numpy.shape(ass)))
-        cc = 0
-        for i in xrange(0,len(ass)):
-            for j in xrange(i+1,len(ass)):
-                sta1 = numpy.std(ass[i])
-                sta2 = numpy.std(ass[j])
-                if sta1 != 0 and sta2 != 0:
-                    a = scipy.signal.fftconvolve(ass[i]-numpy.mean(ass[i]),ass[j][::-1]-numpy.mean(ass[j]),mode='full')/sta1/sta2/len(ass[i])
-                    cc= cc + a
-                
+        logger.info("TTC: " + str(numpy.shape(ass)))
+        # the signals can be 1-D or (L, 1) depending on the neo version, the result keeps their trailing shape
+        shape = numpy.shape(ass[0])[1:]
+        ass = numpy.array([numpy.ravel(a) for a in ass], dtype=numpy.float64)
+        l = ass.shape[1]
+        std = numpy.std(ass, axis=1)
+        # trials with zero variance do not contribute to the cross-correlation,
+        # so they are dropped before any transform is computed
+        active = std != 0
+        if numpy.count_nonzero(active) < 2:
+            return numpy.zeros((2*l-1,) + shape)
+        a = ass[active]
+        # transform all trials at once, zero-padded so that the circular correlation equals the linear one
+        F = numpy.fft.rfft(a - numpy.mean(a, axis=1)[:, numpy.newaxis], n=2*l, axis=1)
+        F = F / std[active][:, numpy.newaxis]
+        # sum over all pairs i<j of F_i * conj(F_j), computed with a running sum over i
+        cs = numpy.cumsum(F, axis=0)
+        spectrum = numpy.sum(cs[:-1] * numpy.conj(F[1:]), axis=0)
+        cc = numpy.fft.irfft(spectrum, n=2*l)
+        # reorder into the 'full' mode layout going from lag -(l-1) to l-1
+        cc = numpy.concatenate([cc[l+1:], cc[:l]]) / l
         cc = cc / (len(ass)*(len(ass)-1)/2)
-	logger.info("TTC: " + str(numpy.shape(ass)))
-        
-        if type(cc) == int:
-           cc = numpy.array([0 for i in xrange(0,len(ass[0])*2-1)]) 
-        
-        return cc
+        logger.info("TTC: " + str(numpy.shape(ass)))
+        return cc.reshape((2*l-1,) + shape)
 
 class TrialAveragedCorrectedCrossCorrelation(Analysis):
       """
@@ -545,10 +690,14 @@ class TrialAveragedCorrectedCrossCorrelation(Analysis):
           t_stop = round( reference.t_stop.rescale(qt.ms), 5 )
           # initialize the correlation matrix
           c = numpy.zeros(bins*2)
+          # work on raw spike times (ms) so that the loop below does not go through quantities
+          reference = reference.rescale(qt.ms).magnitude
+          target = target.rescale(qt.ms).magnitude
+          window = bins*bin_length
           for spr in reference:
               for spt in target:
                   # take only the bins interval
-                  if abs(spr-spt) > bins*bin_length:
+                  if abs(spr-spt) > window:
                       continue
                   #print "mod:", spr, spt, bins, (spr-spt)/bin_length, int(bins+int((spr-spt)/bin_length))
                   c[int(bins+int((spr-spt)/bin_length))-1]+=1 
@@ -1177,9 +1326,9 @@ class Analog_MeanSTDAndFanoFactor(Analysis):
                     esyn_std = numpy.mean(numpy.array([numpy.array([numpy.std(seg.get_esyn(idd)) for idd in esyn_ids]) for seg in segs]),axis=0)
                     isyn_std = numpy.mean(numpy.array([numpy.array([numpy.std(seg.get_isyn(idd)) for idd in isyn_ids]) for seg in segs]),axis=0)
                     # fano factor
-                    vm_fano_factor = numpy.array([std**2/abs(mean) for (std,mean) in zip(vm_std,vm_mean)])
-                    esyn_fano_factor = numpy.array([std**2/abs(mean) for (std,mean) in zip(esyn_std,esyn_mean)])
-                    isyn_fano_factor = numpy.array([std**2/abs(mean) for (std,mean) in zip(isyn_std,isyn_mean)])
+                    vm_fano_factor = numpy.array([std*std/abs(mean) for (std,mean) in zip(vm_std,vm_mean)])
+                    esyn_fano_factor = numpy.array([std*std/abs(mean) for (std,mean) in zip(esyn_std,esyn_mean)])
+                    isyn_fano_factor = numpy.array([std*std/abs(mean) for (std,mean) in zip(isyn_std,isyn_mean)])
                     
                     # save in datastore
                     self.datastore.full_datastore.add_analysis_result(PerNeuronValue(esyn_mean,esyn_ids,segs[0].get_esyn(esyn_ids[0]).units,value_name = 'Mean(ECond)',sheet_name=sheet,tags=self.tags,period=None,analysis_algorithm=self.__class__.__name__,stimulus_id=str(st)))        
@@ -1357,7 +1506,7 @@ class TrialAveragedSparseness(Analysis):
             segs = dsv1.get_segments()
             stids = [MozaikParametrized.idd(s) for s in dsv1.get_stimuli()]
             # transform spike trains due to stimuly to mean_rates
-            mean_rates = [numpy.array(s.mean_rates()) for s in segs]
+            mean_rates = list(mean_rates_matrix(segs))
             # collapse against all parameters other then trial
             (mean_rates, s) = colapse(mean_rates, stids, parameter_list=['trial'])
             # mean_rates is the result of collapsing the whole multidimensional array of recordings (with several parameters) 
@@ -1366,9 +1515,11 @@ class TrialAveragedSparseness(Analysis):
             # Hence, to get the number of stimuli we just count the number of lines of mean_rates:
             nstim = len(mean_rates)
             # take the mean of each rate over trials
-            mean_rates = [sum(a)/len(a) for a in mean_rates]
+            mean_rates = [numpy.mean(numpy.stack(a, axis=0), axis=0) for a in mean_rates]
             # and computing the activity ratio
-            sparseness = numpy.power(numpy.sum(numpy.array(mean_rates),axis=0)/nstim,2) / (numpy.sum(numpy.power(mean_rates,2),axis=0)/nstim)
+            mean_rates = numpy.array(mean_rates)
+            m = numpy.sum(mean_rates,axis=0)/nstim
+            sparseness = m*m / (numpy.sum(mean_rates*mean_rates,axis=0)/nstim)
 
             logger.debug('Adding PerNeuronValue containing trial averaged sparseness to datastore')
 
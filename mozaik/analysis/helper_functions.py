@@ -41,19 +41,53 @@ def psth(spike_list, bin_length,normalize=True):
     t_start = round(spike_list[0].t_start.rescale(qt.ms),5)
     t_stop = round(spike_list[0].t_stop.rescale(qt.ms),5)
     num_bins = int(round((t_stop-t_start)/bin_length))
-    r = (float(t_start), float(t_stop))
+    t_start, t_stop = float(t_start), float(t_stop)
+
+    # bin the spikes of all spike trains at once: each spike gets a flat index neuron*num_bins + bin
+    times = numpy.concatenate([sp.rescale(qt.ms).magnitude for sp in spike_list])
+    neurons = numpy.repeat(numpy.arange(len(spike_list)), [len(sp) for sp in spike_list])
+    valid = (times >= t_start) & (times <= t_stop)
+    times, neurons = times[valid], neurons[valid]
+    # bin against the actual bin edges, so that spikes lying exactly on an edge are assigned as in numpy.histogram
+    edges = numpy.linspace(t_start, t_stop, num_bins + 1)
+    bins = numpy.searchsorted(edges, times, side='right') - 1
+    # as in numpy.histogram the last bin is closed on the right
+    bins[bins == num_bins] = num_bins - 1
+    counts = numpy.bincount(neurons*num_bins + bins, minlength=len(spike_list)*num_bins).reshape(len(spike_list), num_bins)
 
-    for sp in spike_list:
-        assert len(numpy.histogram(sp, bins=num_bins, range=r)[0]) == num_bins
-        
     normalizer = 1.0
     if normalize:
        normalizer = (bin_length/1000.0)
        
-    h = [AnalogSignal(numpy.histogram(sp, bins=num_bins, range=r)[0] /normalizer ,t_start=t_start*qt.ms,sampling_period=bin_length*qt.ms,units=munits.spike_per_sec) for sp in spike_list]
+    h = [AnalogSignal(c /normalizer ,t_start=t_start*qt.ms,sampling_period=bin_length*qt.ms,units=munits.spike_per_sec) for c in counts]
     return  h
 
 
+def mean_rates_matrix(segments):
+    """
+    Returns the mean rates of the spike trains in each of the segments.
+
+    Parameters
+    ----------
+    segments : list(MozaikSegment)
+             The segments, they are assumed to all contain the same neurons.
+
+    Returns
+    -------
+    rates : ndarray
+          A (segments, neurons) array whose rows hold the mean rates (spikes/s) of the segments.
+          If there are no segments it is an empty (0, 0) array.
+    """
+    if len(segments) == 0:
+        return numpy.empty((0, 0))
+    first = numpy.asarray(segments[0].mean_rates())
+    rates = numpy.empty((len(segments), first.shape[0]))
+    rates[0] = first
+    for i in xrange(1, len(segments)):
+        rates[i] = segments[i].mean_rates()
+    return rates
+
+
 def psth_across_trials(spike_trials, bin_length):
     """
     It returns PSTH averaged across the spiketrains
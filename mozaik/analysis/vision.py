@@ -261,7 +261,7 @@ class LocalHomogeneityIndex(Analysis):
                         ty = positions[1][idx]
                         lhi_current[0]+=numpy.exp(-((sx-tx)*(sx-tx)+(sy-ty)*(sy-ty))/(2*sigma*sigma))*numpy.cos(2*pnv.get_value_by_id(y))
                         lhi_current[1]+=numpy.exp(-((sx-tx)*(sx-tx)+(sy-ty)*(sy-ty))/(2*sigma*sigma))*numpy.sin(2*pnv.get_value_by_id(y))
-                    lhis.append(numpy.sqrt(lhi_current[0]*lhi_current[0] + lhi_current[1]*lhi_current[1])/(2*numpy.pi*sigma*sigma))
+                    lhis.append(numpy.hypot(lhi_current[0], lhi_current[1])/(2*numpy.pi*sigma*sigma))
                 
                 self.datastore.full_datastore.add_analysis_result(
                     PerNeuronValue(lhis,
@@ -427,22 +427,41 @@ class DataStore(DataStoreView):
         """
         Add analysis results to data store. If there already exists ADS in the data store with the same parametrization this operation will fail.
         """
-        flag = True
+        self.add_analysis_results([result])
+
+    def add_analysis_results(self, results):
+        """
+        Add a list of analysis results to data store. If there already exists ADS in the data store with the same parametrization this operation will fail.
+        The ADS already in the data store are indexed only once, so that each new ADS is compared only with the ADS that can
+        possibly have the same parametrization.
+        """
+        def key(ads):
+            return (ads.identifier, ads.analysis_algorithm, ads.sheet_name, ads.stimulus_id, ads.neuron)
+
+        index = {}
         for i,ads in enumerate(self.analysis_results):
-            if result.equalParams(ads):
-                flag = False
-                break
-        
-        if flag:
-            self.analysis_results.append(result)
-            return
-        else:
-            if self.replace:
-               logger.info("Warning: ADS with the same parametrization already added in the datastore.: %s" % (str(result))) 
-               self.analysis_results[i] = result
-               return
-            logger.error("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: \n %s \n %s " % (str(result),str(ads)))
-            raise ValueError("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: %s \n %s" % (str(result),str(ads)))
+            index.setdefault(key(ads), []).append(i)
+
+        for result in results:
+            candidates = index.setdefault(key(result), [])
+            flag = True
+            for i in candidates:
+                ads = self.analysis_results[i]
+                if result.equalParams(ads):
+                    flag = False
+                    break
+
+            if flag:
+                candidates.append(len(self.analysis_results))
+                self.analysis_results.append(result)
+                continue
+            else:
+                if self.replace:
+                   logger.info("Warning: ADS with the same parametrization already added in the datastore.: %s" % (str(result))) 
+                   self.analysis_results[i] = result
+                   continue
+                logger.error("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: \n %s \n %s " % (str(result),str(ads)))
+                raise ValueError("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: %s \n %s" % (str(result),str(ads)))
 
 class Hdf5DataStore(DataStore):
     """
@@ -487,25 +506,6 @@ class Hdf5DataStore(DataStore):
         cPickle.dump(self.analysis_results, f)
         f.close()
 
-    def add_analysis_result(self, result):
-        flag = True
-        for i,ads in enumerate(self.analysis_results):
-            if result.equalParams(ads):
-                flag = False
-                break
-        
-        if flag:
-            self.analysis_results.append(result)
-            return
-        else:
-            if self.replace:
-               logger.info("Warning: ADS with the same parametrization already added in the datastore.: %s" % (str(result))) 
-               self.analysis_results[i] = result
-               return
-            logger.error("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: \n %s \n %s " % (str(result),str(ads)))
-            raise ValueError("Analysis Data Structure with the same parametrization already added in the datastore. Currently uniqueness is required. The ADS was not added. User should modify analysis specification to avoid this!: %s \n %s" % (str(result),str(ads)))
-
-
 
 class PickledDataStore(Hdf5DataStore):
     """
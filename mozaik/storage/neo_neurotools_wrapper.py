@@ -119,7 +119,10 @@ class MozaikSegment(Segment):
                 self.load_full()
             for a in self.analogsignals:
                 if a.name == 'gsyn_exc':
-                    return a[:, a.annotations['source_ids'].tolist().index(neuron_id)]
+                    ids = a.annotations['source_ids'].tolist()
+                    if isinstance(neuron_id,list) or isinstance(neuron_id,numpy.ndarray):
+                        return [a[:, ids.index(i)] for i in neuron_id]
+                    return a[:, ids.index(neuron_id)]
 
         def get_isyn(self,neuron_id):
             """
@@ -140,7 +143,10 @@ class MozaikSegment(Segment):
                 self.load_full()
             for a in self.analogsignals:
                 if a.name == 'gsyn_inh':
-                    return a[:, a.annotations['source_ids'].tolist().index(neuron_id)]
+                    ids = a.annotations['source_ids'].tolist()
+                    if isinstance(neuron_id,list) or isinstance(neuron_id,numpy.ndarray):
+                        return [a[:, ids.index(i)] for i in neuron_id]
+                    return a[:, ids.index(neuron_id)]
 
         def load_full(self):
             pass
@@ -133,6 +133,11 @@ class MozaikParametrized(Parameterized):
     
     # we will chache imported modules due to the idd statement here, as module imports seem to be extremely costly.
     _module_cache = {}
+    # similarly we cache the strings passed to idd compiled into code objects, as the same ids are parsed over and over by the analysis code.
+    # Evaluating the cached code still builds fresh parameter objects on each call. The cache lives as long as the process, so it is bounded
+    # to the _idd_cache_size most recently used ids (the least recently used are evicted first) and can be emptied with clear_idd_cache.
+    _idd_cache = collections.OrderedDict()
+    _idd_cache_size = 4096
     
     def __init__(self, **params):
         
@@ -296,6 +301,13 @@ class MozaikParametrized(Parameterized):
                                for name, val in self.get_param_values()])
         return self.__class__.__name__ + "\n" + param_str + "\n"
 
+    @classmethod
+    def clear_idd_cache(cls):
+        """
+        Empties the cache of the ids compiled by the idd class method.
+        """
+        MozaikParametrized._idd_cache.clear()
+
     @classmethod
     def idd(cls,obj):
         """
@@ -309,7 +321,15 @@ class MozaikParametrized(Parameterized):
            return MozaikParametrized.idd(str(obj))
         assert isinstance(obj,str) , "The object passed to the idd class method is not string: %s" % (type(obj)) 
         
-        params = eval(obj)
+        if obj in MozaikParametrized._idd_cache:
+            # re-insert to mark it as the most recently used
+            code = MozaikParametrized._idd_cache.pop(obj)
+        else:
+            code = compile(obj, '<idd>', 'eval')
+            if len(MozaikParametrized._idd_cache) >= MozaikParametrized._idd_cache_size:
+                MozaikParametrized._idd_cache.popitem(last=False)
+        MozaikParametrized._idd_cache[obj] = code
+        params = eval(code)
         name = params.pop("name")
         module_path = params.pop("module_path")
         
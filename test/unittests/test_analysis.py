@@ -1,4 +1,14 @@
 import unittest
+import numpy
+import scipy.signal
+import quantities as qt
+from neo import SpikeTrain
+from neo import AnalogSignal as NeoAnalogSignal
+from parameters import ParameterSet
+from mozaik.analysis.helper_functions import psth, mean_rates_matrix
+from mozaik.tools.circ_stat import circ_mean
+import mozaik.analysis.analysis
+from mozaik.analysis.analysis import TrialToTrialCrossCorrelationOfAnalogSignalList, GSTA
 
 
 
@@ -27,17 +37,154 @@ class TestAnalysis(unittest.TestCase):
     pass
 
 class TestTrialAveragedFiringRate(unittest.TestCase):
-    pass
+
+    def test_mean_rates_matrix_of_no_segments(self):
+        # sheets without segments have to yield no mean rates
+        self.assertEqual(mean_rates_matrix([]).shape, (0, 0))
+        self.assertEqual(list(mean_rates_matrix([])), [])
 
 class TestPeriodicTuningCurvePreferenceAndSelectivity_VectorAverage(unittest.TestCase):
-    pass
+
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.P = numpy.linspace(0, 2*numpy.pi, 8, endpoint=False)
+        self.V = rng.rand(8, 50)
+        # a neuron with all-zero responses
+        self.V[:, 0] = 0
+        # a neuron with negative responses
+        self.V[:, 1] = -rng.rand(8)
+        # a neuron whose mean vector lies just below the x axis (y ~ -0)
+        self.P_y0 = numpy.array([0, numpy.pi/2, numpy.pi, 3*numpy.pi/2])
+        self.V_y0 = numpy.array([[1.0], [0.0], [0.0], [1e-16]])
+
+    def check(self, vector_average):
+        for (V, P) in [(self.V, self.P), (self.V_y0, self.P_y0)]:
+            angle, length = vector_average(V, P)
+            expected_angle, expected_length = circ_mean(numpy.zeros(V.shape) + P[:, numpy.newaxis], weights=V, axis=0, normalize=True)
+            self.assertTrue(numpy.all((angle >= 0) & (angle < 2*numpy.pi)))
+            numpy.testing.assert_allclose(angle, expected_angle, atol=1e-12)
+            numpy.testing.assert_allclose(length, expected_length, atol=1e-12)
+        self.assertEqual(vector_average(self.V_y0, self.P_y0)[0][0], 0)
+
+    def test_numpy_vector_average_matches_circ_mean(self):
+        self.check(mozaik.analysis.analysis._vector_average_numpy)
+
+    @unittest.skipIf(mozaik.analysis.analysis.numba is None, "numba is not installed")
+    def test_numba_vector_average_matches_circ_mean(self):
+        self.check(mozaik.analysis.analysis._vector_average)
 
 class TestGSTA(unittest.TestCase):
-    pass
+
+    @staticmethod
+    def per_spike_gsta(analog_signal, sp, length):
+        """
+        The original per spike implementation of GSTA._do_gsta for a single neuron
+        (with the lower window bound idx >= gstal).
+        """
+        dt = analog_signal[0].sampling_period
+        gstal = int(length/dt)
+        gsta = numpy.zeros(2*gstal + 1,)
+        count = 0
+        for (ans, spike) in zip(analog_signal, sp):
+            for time in spike:
+                if time > ans.t_start and time < ans.t_stop:
+                    idx = int((time - ans.t_start)/dt)
+                    if idx - gstal >= 0 and (idx + gstal + 1) <= len(ans):
+                        gsta = gsta + ans[idx-gstal:idx+gstal+1].magnitude.flatten()
+                        count += 1
+        if count == 0:
+            count = 1
+        return gsta / count
+
+    def test_matches_per_spike_gsta(self):
+        rng = numpy.random.RandomState(0)
+        neurons = [3, 8, 11]
+        gsta = GSTA.__new__(GSTA)
+        gsta.parameters = ParameterSet({'length': 5.0, 'neurons': neurons})
+        dt = 0.1*qt.ms
+        g_e, g_i, sp = [], [], []
+        # trials of different lengths and starting times
+        for (t_start, l) in [(0.0, 2000), (100.0, 1500), (250.0, 3001)]:
+            t_stop = t_start + l*dt.magnitude
+            g_e.append([NeoAnalogSignal(rng.rand(l, 1), units=qt.nS, t_start=t_start*qt.ms, sampling_period=dt) for n in neurons])
+            g_i.append([NeoAnalogSignal(rng.rand(l, 1), units=qt.nS, t_start=t_start*qt.ms, sampling_period=dt) for n in neurons])
+            times = [numpy.sort(numpy.round(rng.uniform(t_start, t_stop, 40), 1)) for n in neurons]
+            # spikes too close to the start and end of the recording, and on its edges
+            times[0] = numpy.sort(numpy.concatenate([times[0], [t_start, t_start + 1.0, t_start + 4.9, t_start + 5.0, t_stop - 5.1, t_stop - 5.0, t_stop - 1.0, t_stop]]))
+            # the last neuron has no spikes with a whole window in the recording
+            times[2] = numpy.array([t_start + 0.3, t_stop - 0.2])
+            sp.append([SpikeTrain(t*qt.ms, t_start=t_start*qt.ms, t_stop=t_stop*qt.ms) for t in times])
+        # unsorted spikes, some of them before the start of the trial
+        sp[1][1] = SpikeTrain(numpy.array([140.0, 50.0, 240.0, 120.0])*qt.ms, t_start=0.0*qt.ms, t_stop=250.0*qt.ms)
+
+        asl_e, asl_i = gsta._do_gsta(g_e, g_i, sp)
+        for i in xrange(len(neurons)):
+            for (asl, g) in [(asl_e, g_e), (asl_i, g_i)]:
+                expected = self.per_spike_gsta([trial[i] for trial in g], [trial[i] for trial in sp], 5.0)
+                self.assertEqual(asl[i].units, qt.nS)
+                self.assertAlmostEqual(float(asl[i].t_start.rescale(qt.ms)), -5.0)
+                numpy.testing.assert_allclose(numpy.ravel(asl[i].magnitude), expected)
+        numpy.testing.assert_array_equal(numpy.ravel(asl_e[2].magnitude), numpy.zeros(101))
+
+    @unittest.skipIf(mozaik.analysis.analysis.numba is None, "numba is not installed")
+    def test_numba_window_sum_matches_numpy(self):
+        rng = numpy.random.RandomState(0)
+        raw = rng.randn(100000)
+        for (n, gstal) in [(1, 50), (7, 0), (1000, 200)]:
+            idx = numpy.sort(rng.randint(gstal, len(raw) - gstal, n)).astype(numpy.int64)
+            numpy.testing.assert_allclose(mozaik.analysis.analysis._gsta_window_sum(raw, idx, gstal),
+                                          mozaik.analysis.analysis._gsta_window_sum_numpy(raw, idx, gstal))
 
 class TestPrecision(unittest.TestCase):
     pass
 
+class TestTrialToTrialCrossCorrelationOfAnalogSignalList(unittest.TestCase):
+
+    @staticmethod
+    def pairwise_cross_correlation(ass):
+        # the original pairwise implementation the batched one has to match
+        cc = 0
+        for i in xrange(0,len(ass)):
+            for j in xrange(i+1,len(ass)):
+                sta1 = numpy.std(ass[i])
+                sta2 = numpy.std(ass[j])
+                if sta1 != 0 and sta2 != 0:
+                    a = scipy.signal.fftconvolve(ass[i]-numpy.mean(ass[i]),ass[j][::-1]-numpy.mean(ass[j]),mode='full')/sta1/sta2/len(ass[i])
+                    cc= cc + a
+        return cc / (len(ass)*(len(ass)-1)/2)
+
+    def setUp(self):
+        self.analysis = TrialToTrialCrossCorrelationOfAnalogSignalList.__new__(TrialToTrialCrossCorrelationOfAnalogSignalList)
+        self.rng = numpy.random.RandomState(0)
+
+    def test_1d_signals(self):
+        ass = [self.rng.rand(50) for i in xrange(4)]
+        cc = self.analysis.cross_correlation(ass)
+        ref = self.pairwise_cross_correlation(ass)
+        self.assertEqual(cc.shape, ref.shape)
+        numpy.testing.assert_allclose(cc, ref, atol=1e-12)
+
+    def test_column_signals(self):
+        ass = [self.rng.rand(50, 1) for i in xrange(4)]
+        cc = self.analysis.cross_correlation(ass)
+        ref = self.pairwise_cross_correlation(ass)
+        self.assertEqual(cc.shape, (99, 1))
+        numpy.testing.assert_allclose(cc, ref, atol=1e-12)
+
+    def test_flat_trials_are_ignored(self):
+        ass = [self.rng.rand(50, 1) for i in xrange(4)]
+        ass[1] = numpy.ones((50, 1))
+        cc = self.analysis.cross_correlation(ass)
+        numpy.testing.assert_allclose(cc, self.pairwise_cross_correlation(ass), atol=1e-12)
+
+    def test_single_active_trial(self):
+        ass = [numpy.ones((50, 1)) for i in xrange(4)]
+        ass[2] = self.rng.rand(50, 1)
+        cc = self.analysis.cross_correlation(ass)
+        self.assertEqual(cc.shape, (99, 1))
+        self.assertTrue(numpy.all(cc == 0))
+
+
 class TestModulationRatio(unittest.TestCase):
     pass
 
@@ -51,7 +198,18 @@ class TestGaussianTuningCurveFit(unittest.TestCase):
     pass
 
 class TestPSTH(unittest.TestCase):
-    pass
+
+    def test_matches_numpy_histogram(self):
+        rng = numpy.random.RandomState(0)
+        for (t_stop, bin_length) in [(2002.0, 5.0), (1000.0, 7.0), (150.0, 0.5)]:
+            num_bins = int(round(t_stop/bin_length))
+            # spikes on the 0.1 ms simulation grid, including every bin edge
+            times = [numpy.sort(numpy.round(rng.uniform(0, t_stop, 300), 1)) for i in xrange(3)]
+            times[0] = numpy.sort(numpy.concatenate([times[0], numpy.linspace(0, t_stop, num_bins+1)]))
+            spike_list = [SpikeTrain(t, t_start=0.0*qt.ms, t_stop=t_stop*qt.ms, units=qt.ms) for t in times]
+            h = psth(spike_list, bin_length, normalize=False)
+            for a, t in zip(h, times):
+                numpy.testing.assert_array_equal(numpy.ravel(a.magnitude), numpy.histogram(t, bins=num_bins, range=(0, t_stop))[0])
 
 class TestTemporalBinAverage(unittest.TestCase):
     pass
@@ -1,4 +1,8 @@
 import unittest
+import quantities as qt
+from parameters import ParameterSet
+from mozaik.storage.datastore import DataStore
+from mozaik.analysis.data_structures import PerNeuronValue
 
 
 class TestDataStoreView(unittest.TestCase):
@@ -6,7 +10,40 @@ class TestDataStoreView(unittest.TestCase):
 
 
 class TestDataStore(unittest.TestCase):
-    pass
+
+    def datastore(self, replace):
+        return DataStore(load=False,
+                         parameters=ParameterSet({'root_directory': '.', 'store_stimuli': False}),
+                         replace=replace)
+
+    def pnv(self, value, value_name='Firing rate', sheet_name='V1'):
+        return PerNeuronValue([value], [1], qt.Hz, value_name=value_name, sheet_name=sheet_name,
+                              analysis_algorithm='TrialAveragedFiringRate', stimulus_id='stimulus')
+
+    def test_add_analysis_results(self):
+        datastore = self.datastore(False)
+        ads = [self.pnv(1.0), self.pnv(2.0, value_name='Firing rate variance'), self.pnv(3.0, sheet_name='V2')]
+        datastore.add_analysis_results(ads)
+        self.assertEqual(datastore.analysis_results, ads)
+
+    def test_duplicate_raises(self):
+        datastore = self.datastore(False)
+        datastore.add_analysis_result(self.pnv(1.0))
+        self.assertRaises(ValueError, datastore.add_analysis_result, self.pnv(2.0))
+        self.assertRaises(ValueError, datastore.add_analysis_results, [self.pnv(3.0, sheet_name='V2'), self.pnv(4.0, sheet_name='V2')])
+
+    def test_duplicate_replaces(self):
+        datastore = self.datastore(True)
+        first = self.pnv(0.0, sheet_name='V2')
+        datastore.add_analysis_results([first, self.pnv(1.0)])
+        other = self.pnv(3.0, value_name='Firing rate variance')
+        last = self.pnv(4.0)
+        datastore.add_analysis_results([self.pnv(2.0), other, last])
+        # the later ADS replaces the one with the same parametrization in place
+        self.assertEqual(len(datastore.analysis_results), 3)
+        self.assertTrue(datastore.analysis_results[0] is first)
+        self.assertTrue(datastore.analysis_results[1] is last)
+        self.assertTrue(datastore.analysis_results[2] is other)
 
 
 class TestHdf5DataStore(unittest.TestCase):